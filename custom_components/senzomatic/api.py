@@ -13,6 +13,7 @@ import time
 from typing import Any
 
 import aiohttp
+import orjson
 
 from .const import VMPROXY_BASE_URL
 
@@ -20,7 +21,17 @@ _LOGGER = logging.getLogger(__name__)
 
 MAX_RETRIES = 3
 RETRY_BACKOFF_BASE = 2  # seconds
+MAX_RETRY_AFTER = 60  # seconds, cap on a server-requested Retry-After delay
+RETRYABLE_STATUSES = (429, 502, 503, 504)
 REQUEST_TIMEOUT = 30  # seconds
+QUERY_STEP = 300  # seconds between samples in a query_range result
+QUERY_WINDOW = QUERY_STEP  # start..end at this step gives two points; the newest is used
+MAX_CONCURRENT_REQUESTS = 8
+BULK_QUERY_CHUNK_SIZE = 50  # device ids per regex selector, keeps URLs short
+DEVICE_LIST_TTL = 6 * 3600  # seconds before config.json is re-read
+BOOTSTRAP_RETRY_INTERVAL = 60  # seconds a failed bootstrap is reused before retrying
+SUPPORTED_METRICS_TTL = 24 * 3600  # seconds before skipped metrics are probed again
+METRIC_MISS_LIMIT = 3  # consecutive refreshes a live device answers without a metric
 
 METRICS = [
     "temperature_ambient_celsius",
@@ -29,6 +40,8 @@ METRICS = [
     "moisture",
 ]
 
+_UNIT_ID_RE = re.compile(r"/central_units/([0-9a-f-]+)")
+
 
 class SenzomaticAPI:
     """API client for Senzomatic system."""
@@ -40,8 +53,18 @@ class SenzomaticAPI:
         self.jwt: str | None = None
         self.unit_id: str | None = None
         self.devices: list[dict[str, Any]] = []
+        self._devices_ts: float | None = None
+        # Per device, how many refreshes in a row a metric came back empty while
+        # the device reported other metrics. Failed queries and offline devices
+        # leave the count alone; metrics in _reported_metrics are never skipped.
+        self._metric_misses: dict[str, dict[str, int]] = {}
+        self._reported_metrics: dict[str, set[str]] = {}
+        self._metric_misses_ts: float | None = None
         self._request_count = 0
         self._failed_request_count = 0
+        self._request_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self._auth_lock = asyncio.Lock()
+        self._bootstrap_failed_ts: float | None = None
         _LOGGER.info("Senzomatic API client initialized for host: %s", host)
 
     async def async_authenticate(self) -> bool:
@@ -52,6 +75,30 @@ class SenzomaticAPI:
             _LOGGER.error("Bootstrap from %s failed: %s", self.host, exc)
             return False
 
+    async def _async_ensure_auth(self) -> bool:
+        """Bootstrap if there is no token, letting concurrent callers share one attempt."""
+        if self.jwt:
+            return True
+        async with self._auth_lock:
+            if self.jwt:
+                return True
+            return await self._async_bootstrap_locked()
+
+    async def _async_bootstrap_locked(self) -> bool:
+        """Bootstrap while holding the auth lock, reusing a recent failure.
+
+        Without this, every caller queued on the lock behind a failed attempt
+        would make its own (up to REQUEST_TIMEOUT long) config.json request.
+        """
+        if (
+            self._bootstrap_failed_ts is not None
+            and time.monotonic() - self._bootstrap_failed_ts < BOOTSTRAP_RETRY_INTERVAL
+        ):
+            return False
+        success = await self.async_authenticate()
+        self._bootstrap_failed_ts = None if success else time.monotonic()
+        return success
+
     async def _async_bootstrap(self) -> bool:
         """Fetch /var/config.json for the JWT and device list."""
         url = f"http://{self.host}/var/config.json"
@@ -59,16 +106,13 @@ class SenzomaticAPI:
         async with self.session.get(url, timeout=timeout) as response:
             self._request_count += 1
             response.raise_for_status()
-            # Device serves application/json but be lenient about content-type.
-            cfg = await response.json(content_type=None)
+            # Parse the raw bytes, ignoring content-type (the device is not strict).
+            cfg = orjson.loads(await response.read())
 
         self.jwt = cfg.get("global", {}).get("jwt_token")
         # Stable identity: the Central Unit UUID embedded in its cloud URLs
         # (survives IP changes, unlike the host). Fall back to host if absent.
-        match = re.search(
-            r"/central_units/([0-9a-f-]+)",
-            cfg.get("cloud_api", {}).get("config_url", ""),
-        )
+        match = _UNIT_ID_RE.search(cfg.get("cloud_api", {}).get("config_url", ""))
         self.unit_id = match.group(1) if match else self.host
         self.devices = [
             {
@@ -83,6 +127,7 @@ class SenzomaticAPI:
         if not self.jwt:
             _LOGGER.error("No jwt_token in config.json from %s", self.host)
             return False
+        self._devices_ts = time.monotonic()
         _LOGGER.info("Bootstrapped %d devices from %s", len(self.devices), self.host)
         return bool(self.devices)
 
@@ -96,6 +141,8 @@ class SenzomaticAPI:
                 last_exception = exc
                 if attempt < MAX_RETRIES - 1:
                     wait_time = RETRY_BACKOFF_BASE**attempt
+                    if isinstance(exc, aiohttp.ClientResponseError):
+                        wait_time = max(wait_time, _retry_after(exc.headers))
                     _LOGGER.warning(
                         "Request failed (attempt %d/%d), retrying in %ds: %s",
                         attempt + 1, MAX_RETRIES, wait_time, exc,
@@ -108,6 +155,11 @@ class SenzomaticAPI:
                 raise
         raise last_exception
 
+    async def _async_refresh_devices(self) -> bool:
+        """Re-read config.json under the auth lock."""
+        async with self._auth_lock:
+            return await self._async_bootstrap_locked()
+
     async def async_get_sensor_data(
         self,
         device_id: str,
@@ -116,84 +168,190 @@ class SenzomaticAPI:
         end_time: int | None = None,
     ) -> dict[str, Any]:
         """Get sensor data for a specific device and metric from the VM proxy."""
-        if not self.jwt and not await self.async_authenticate():
-            return {}
+        data = await self._async_query_range(
+            _build_query(metric, f'device_id="{device_id}"'),
+            f"device={device_id[:8]}..., metric={metric}",
+            start_time,
+            end_time,
+        )
+        return data or {}
+
+    async def async_get_sensor_data_bulk(
+        self, device_ids: list[str], metric: str
+    ) -> dict[str, float | None]:
+        """Get the latest value of one metric for many devices.
+
+        Devices are matched with a regex label selector so a single query covers
+        up to BULK_QUERY_CHUNK_SIZE devices. Every device in a chunk that was
+        answered gets an entry (None if it had no series); devices in a chunk
+        whose query failed are left out.
+        """
+        chunks = [
+            device_ids[i : i + BULK_QUERY_CHUNK_SIZE]
+            for i in range(0, len(device_ids), BULK_QUERY_CHUNK_SIZE)
+        ]
+        responses = await asyncio.gather(
+            *(self._async_get_chunk_limited(chunk, metric) for chunk in chunks)
+        )
 
+        values: dict[str, float | None] = {}
+        for chunk, data in zip(chunks, responses):
+            try:
+                series_list = data["data"]["result"]
+            except (KeyError, TypeError):
+                continue
+            values.update(dict.fromkeys(chunk))
+            for series in series_list:
+                device_id = series.get("metric", {}).get("device_id")
+                value = _latest_value(series)
+                if device_id and value is not None:
+                    values[device_id] = value
+        return values
+
+    async def _async_get_chunk_limited(
+        self, device_ids: list[str], metric: str
+    ) -> dict[str, Any] | None:
+        """Query one chunk of devices while holding a slot in the request semaphore."""
+        selector = f'device_id=~"{"|".join(device_ids)}"'
+        async with self._request_semaphore:
+            return await self._async_query_range(
+                _build_query(metric, selector),
+                f"devices={len(device_ids)}, metric={metric}",
+            )
+
+    async def _async_query_range(
+        self,
+        query: str,
+        context: str,
+        start_time: int | None = None,
+        end_time: int | None = None,
+    ) -> dict[str, Any] | None:
+        """Run a query_range against the VM proxy, returning None on failure."""
         now = int(time.time())
-        start_time = start_time or now - 3600  # last hour
+        start_time = start_time or now - QUERY_WINDOW
         end_time = end_time or now
 
         async def _fetch():
-            if metric == "moisture":
-                # Model-dependent moisture source; MHT02 reports humidity, others resistance.
-                query = (
-                    f'round(avg(label_del((moisture_humidity_pct{{device_id="{device_id}",device_model="MHT02"}} '
-                    f'or moisture_resistance_pct{{device_id="{device_id}",device_model!="MHT02"}} '
-                    f'or moisture_pct{{device_id="{device_id}",device_model!="MHT02"}}),"scrape_id"))by(device_id),0.01)'
-                )
-            else:
-                query = f'round(avg(label_del({metric}{{device_id="{device_id}"}},"scrape_id"))by(device_id),0.01)'
-
+            # Checked per attempt so a retry after a 401/403 re-bootstraps first.
+            if not await self._async_ensure_auth():
+                return None
             url = f"{VMPROXY_BASE_URL}/query_range"
-            params = {"query": query, "start": start_time, "end": end_time, "step": 300}
-            headers = {"Authorization": f"Bearer {self.jwt}"}
+            params = {"query": query, "start": start_time, "end": end_time, "step": QUERY_STEP}
+            token = self.jwt
+            headers = {"Authorization": f"Bearer {token}"}
             timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
 
             async with self.session.get(url, params=params, headers=headers, timeout=timeout) as response:
                 self._request_count += 1
                 if response.status in (401, 403):
-                    # Token rotated or revoked; drop it so the next cycle re-bootstraps.
+                    # Token rotated or revoked; drop it so the next attempt re-bootstraps,
+                    # unless another caller already replaced the token we sent.
                     _LOGGER.warning("VM proxy returned %d, invalidating token", response.status)
-                    self.jwt = None
+                    if self.jwt == token:
+                        self.jwt = None
                     raise aiohttp.ClientResponseError(
                         request_info=response.request_info,
                         history=response.history,
                         status=response.status,
                         message="Authentication required",
                     )
-                if response.status != 200:
+                if response.status in RETRYABLE_STATUSES:
+                    # Throttled or proxy hiccup; let _retry_with_backoff try again.
                     self._failed_request_count += 1
-                    _LOGGER.error(
-                        "VM query failed: device=%s..., metric=%s, status=%d",
-                        device_id[:8], metric, response.status,
+                    raise aiohttp.ClientResponseError(
+                        request_info=response.request_info,
+                        history=response.history,
+                        status=response.status,
+                        message="Temporarily unavailable",
+                        headers=response.headers,
                     )
-                    return {}
-                return await response.json()
+                if response.status != 200:
+                    self._failed_request_count += 1
+                    _LOGGER.error("VM query failed: %s, status=%d", context, response.status)
+                    return None
+                return orjson.loads(await response.read())
 
         try:
             return await self._retry_with_backoff(_fetch)
         except Exception as exc:  # noqa: BLE001
-            _LOGGER.error(
-                "Error getting sensor data after retries: device=%s..., metric=%s: %s",
-                device_id[:8], metric, exc,
-            )
-            return {}
+            _LOGGER.error("Error getting sensor data after retries: %s: %s", context, exc)
+            return None
 
     async def async_get_data(self) -> dict[str, Any]:
         """Get latest values for all metrics across all devices."""
-        if not self.devices and not await self.async_authenticate():
-            _LOGGER.warning("No devices available to fetch data from")
-            return {}
+        devices_stale = (
+            self._devices_ts is None
+            or time.monotonic() - self._devices_ts >= DEVICE_LIST_TTL
+        )
+        # A failed periodic refresh keeps the cached list; the unit may just be
+        # briefly unreachable on the LAN while the cloud token is still valid.
+        if (not self.devices or devices_stale) and not await self._async_refresh_devices():
+            if not self.devices:
+                _LOGGER.warning("No devices available to fetch data from")
+                return {}
 
         result: dict[str, Any] = {"devices": [], "sensors": {}}
 
-        for device in self.devices:
-            device_id = device["uuid"]
-            device_data: dict[str, float] = {}
+        if (
+            self._metric_misses_ts is None
+            or time.monotonic() - self._metric_misses_ts >= SUPPORTED_METRICS_TTL
+        ):
+            # Periodically forget skipped metrics in case hardware changed.
+            self._metric_misses = {}
+            self._reported_metrics = {}
+            self._metric_misses_ts = time.monotonic()
+
+        # One bulk query per metric (per chunk of devices), skipping devices that
+        # kept reporting other metrics but never this one; the semaphore keeps the
+        # VM proxy from seeing more than MAX_CONCURRENT_REQUESTS at a time.
+        metric_values = await asyncio.gather(
+            *(
+                self.async_get_sensor_data_bulk(
+                    [
+                        device["uuid"]
+                        for device in self.devices
+                        if self._metric_misses.get(device["uuid"], {}).get(metric, 0)
+                        < METRIC_MISS_LIMIT
+                    ],
+                    metric,
+                )
+                for metric in METRICS
+            )
+        )
 
-            for metric in METRICS:
-                data = await self.async_get_sensor_data(device_id, metric)
-                value = _latest_value(data)
+        sensors: dict[str, dict[str, float]] = {}
+        for metric, values in zip(METRICS, metric_values):
+            for device_id, value in values.items():
                 if value is not None:
-                    device_data[metric] = value
+                    sensors.setdefault(device_id, {})[metric] = value
+                    self._reported_metrics.setdefault(device_id, set()).add(metric)
+                    self._metric_misses.get(device_id, {}).pop(metric, None)
+
+        # Only count an empty answer as a miss when the device is evidently online
+        # (it reported something else this refresh) and has never reported it.
+        for metric, values in zip(METRICS, metric_values):
+            for device_id, value in values.items():
+                if (
+                    value is None
+                    and device_id in sensors
+                    and metric not in self._reported_metrics.get(device_id, ())
+                ):
+                    misses = self._metric_misses.setdefault(device_id, {})
+                    misses[metric] = misses.get(metric, 0) + 1
 
-            if device_data:
+        for device in self.devices:
+            if device_data := sensors.get(device["uuid"]):
                 result["devices"].append(device)
                 result["sensors"][device["id"]] = device_data
             else:
-                _LOGGER.debug("No sensor data for %s (%s...)", device["name"], device_id[:8])
+                _LOGGER.debug("No sensor data for %s (%s...)", device["name"], device["uuid"][:8])
+
+        if not result["devices"]:
+            # Nothing came back; re-read config.json and re-probe metrics next cycle.
+            self._devices_ts = None
+            self._metric_misses_ts = None
 
-        _LOGGER.info(
+        _LOGGER.debug(
             "Data fetch complete: %d/%d devices, requests=%d, failed=%d",
             len(result["devices"]), len(self.devices),
             self._request_count, self._failed_request_count,
@@ -201,10 +359,30 @@ class SenzomaticAPI:
         return result
 
 
-def _latest_value(data: dict[str, Any]) -> float | None:
-    """Extract the newest sample from a VM query_range matrix response."""
+def _build_query(metric: str, selector: str) -> str:
+    """Build the PromQL query for a metric, filtered by a device_id selector."""
+    if metric == "moisture":
+        # Model-dependent moisture source; MHT02 reports humidity, others resistance.
+        return (
+            f'round(avg(label_del((moisture_humidity_pct{{{selector},device_model="MHT02"}} '
+            f'or moisture_resistance_pct{{{selector},device_model!="MHT02"}} '
+            f'or moisture_pct{{{selector},device_model!="MHT02"}}),"scrape_id"))by(device_id),0.01)'
+        )
+    return f'round(avg(label_del({metric}{{{selector}}},"scrape_id"))by(device_id),0.01)'
+
+
+def _retry_after(headers: Any) -> int:
+    """Return the Retry-After delay in seconds (0 if absent or not numeric)."""
+    try:
+        return min(int(headers["Retry-After"]), MAX_RETRY_AFTER)
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+
+def _latest_value(series: dict[str, Any]) -> float | None:
+    """Extract the newest sample from one series of a VM query_range matrix."""
     try:
-        values = data["data"]["result"][0]["values"]
+        values = series["values"]
         return float(values[-1][1]) if values else None
     except (KeyError, IndexError, TypeError, ValueError):
         return None
@@ -14,7 +14,7 @@ from homeassistant.const import (
     PERCENTAGE,
     UnitOfTemperature,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
@@ -31,6 +31,15 @@ from .const import (
 
 _LOGGER = logging.getLogger(__name__)
 
+# (sensor type, name, unit, device class) for each metric the API can report.
+SENSOR_SPECS: tuple[tuple[str, str, str, SensorDeviceClass | None], ...] = (
+    (SENSOR_TEMPERATURE, "Temperature", UnitOfTemperature.CELSIUS, SensorDeviceClass.TEMPERATURE),
+    (SENSOR_REL_HUMIDITY, "Relative Humidity", PERCENTAGE, SensorDeviceClass.HUMIDITY),
+    (SENSOR_ABS_HUMIDITY, "Absolute Humidity", UNIT_GRAMS_PER_M3, None),
+    # Only reported by devices with a wood moisture probe.
+    (SENSOR_MOISTURE, "Wood Moisture", PERCENTAGE, SensorDeviceClass.MOISTURE),
+)
+
 async def async_setup_entry(
     hass: HomeAssistant,
     config_entry: ConfigEntry,
@@ -66,80 +75,30 @@ async def async_setup_entry(
 
             # Check which sensors have data for this device
             sensor_data = coordinator.data.get("sensors", {}).get(device_id, {})
-            _LOGGER.debug(
-                "Device %s has %d sensor metrics: %s",
-                device_name,
-                len(sensor_data),
-                list(sensor_data.keys())
-            )
-
-            # Temperature sensor
-            if SENSOR_TEMPERATURE in sensor_data:
-                entities.append(
-                    SenzomaticSensor(
-                        coordinator=coordinator,
-                        device_id=device_id,
-                        device_name=device_name,
-                        device_model=device_model,
-                        sensor_type=SENSOR_TEMPERATURE,
-                        name="Temperature",
-                        unit=UnitOfTemperature.CELSIUS,
-                        device_class=SensorDeviceClass.TEMPERATURE,
-                        state_class=SensorStateClass.MEASUREMENT,
-                    )
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug(
+                    "Device %s has %d sensor metrics: %s",
+                    device_name,
+                    len(sensor_data),
+                    list(sensor_data.keys())
                 )
-                _LOGGER.debug("Added temperature sensor for %s", device_name)
 
-            # Relative humidity sensor
-            if SENSOR_REL_HUMIDITY in sensor_data:
-                entities.append(
-                    SenzomaticSensor(
-                        coordinator=coordinator,
-                        device_id=device_id,
-                        device_name=device_name,
-                        device_model=device_model,
-                        sensor_type=SENSOR_REL_HUMIDITY,
-                        name="Relative Humidity",
-                        unit=PERCENTAGE,
-                        device_class=SensorDeviceClass.HUMIDITY,
-                        state_class=SensorStateClass.MEASUREMENT,
+            for sensor_type, name, unit, device_class in SENSOR_SPECS:
+                if sensor_type in sensor_data:
+                    entities.append(
+                        SenzomaticSensor(
+                            coordinator=coordinator,
+                            device_id=device_id,
+                            device_name=device_name,
+                            device_model=device_model,
+                            sensor_type=sensor_type,
+                            name=name,
+                            unit=unit,
+                            device_class=device_class,
+                            state_class=SensorStateClass.MEASUREMENT,
+                        )
                     )
-                )
-                _LOGGER.debug("Added relative humidity sensor for %s", device_name)
-
-            # Absolute humidity sensor
-            if SENSOR_ABS_HUMIDITY in sensor_data:
-                entities.append(
-                    SenzomaticSensor(
-                        coordinator=coordinator,
-                        device_id=device_id,
-                        device_name=device_name,
-                        device_model=device_model,
-                        sensor_type=SENSOR_ABS_HUMIDITY,
-                        name="Absolute Humidity",
-                        unit=UNIT_GRAMS_PER_M3,
-                        device_class=None,
-                        state_class=SensorStateClass.MEASUREMENT,
-                    )
-                )
-                _LOGGER.debug("Added absolute humidity sensor for %s", device_name)
-
-            # Moisture sensor (only for devices that support it)
-            if SENSOR_MOISTURE in sensor_data:
-                entities.append(
-                    SenzomaticSensor(
-                        coordinator=coordinator,
-                        device_id=device_id,
-                        device_name=device_name,
-                        device_model=device_model,
-                        sensor_type=SENSOR_MOISTURE,
-                        name="Wood Moisture",
-                        unit=PERCENTAGE,
-                        device_class=SensorDeviceClass.MOISTURE,
-                        state_class=SensorStateClass.MEASUREMENT,
-                    )
-                )
-                _LOGGER.debug("Added moisture sensor for %s", device_name)
+                    _LOGGER.debug("Added %s sensor for %s", name, device_name)
     else:
         _LOGGER.warning(
             "No coordinator data available during sensor setup (data=%s)",
@@ -168,15 +127,23 @@ class SenzomaticSensor(CoordinatorEntity, SensorEntity):
         super().__init__(coordinator)
         
         self._device_id = device_id
-        self._device_name = device_name
-        self._device_model = device_model
         self._sensor_type = sensor_type
         self._attr_name = f"{device_name} {name}"
         self._attr_unique_id = f"{DOMAIN}_{device_id}_{sensor_type}"
         self._attr_native_unit_of_measurement = unit
         self._attr_device_class = device_class
         self._attr_state_class = state_class
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, device_id)},
+            name=device_name,
+            manufacturer="MoistureGuard",
+            model=device_model,
+            sw_version="1.0",
+        )
         self._last_availability = None
+        self._has_device_data = False
+        self._cached_value: float | None = None
+        self._update_cached_data()
         
         _LOGGER.debug(
             "Initialized sensor: %s (device_id=%s..., type=%s)",
@@ -185,57 +152,53 @@ class SenzomaticSensor(CoordinatorEntity, SensorEntity):
             sensor_type
         )
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return the device info."""
-        return DeviceInfo(
-            identifiers={(DOMAIN, self._device_id)},
-            name=self._device_name,
-            manufacturer="MoistureGuard",
-            model=self._device_model,
-            sw_version="1.0",
-        )
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Refresh the cached value, then write state."""
+        self._update_cached_data()
+        super()._handle_coordinator_update()
 
-    @property
-    def native_value(self) -> float | None:
-        """Return the native value of the sensor."""
+    def _update_cached_data(self) -> None:
+        """Cache this sensor's value from the latest coordinator data."""
         if not self.coordinator.data:
             _LOGGER.debug(
                 "No coordinator data for sensor %s",
                 self._attr_name
             )
-            return None
-            
-        sensor_data = self.coordinator.data.get("sensors", {}).get(self._device_id, {})
-        value = sensor_data.get(self._sensor_type)
-        
+            self._has_device_data = False
+            self._cached_value = None
+            return
+
+        sensor_data = self.coordinator.data.get("sensors", {}).get(self._device_id)
+        self._has_device_data = sensor_data is not None
+        value = sensor_data.get(self._sensor_type) if sensor_data else None
+
         if value is not None:
-            rounded_value = round(float(value), 2)
+            self._cached_value = round(float(value), 2)
             _LOGGER.debug(
                 "Sensor %s updated: %.2f %s",
                 self._attr_name,
-                rounded_value,
+                self._cached_value,
                 self._attr_native_unit_of_measurement
             )
-            return rounded_value
         else:
+            self._cached_value = None
             _LOGGER.debug(
                 "No value available for sensor %s (type=%s, device_id=%s...)",
                 self._attr_name,
                 self._sensor_type,
                 self._device_id[:8]
             )
-        
-        return None
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the native value of the sensor."""
+        return self._cached_value
 
     @property
     def available(self) -> bool:
         """Return if entity is available."""
-        is_available = (
-            self.coordinator.last_update_success
-            and self.coordinator.data is not None
-            and self._device_id in self.coordinator.data.get("sensors", {})
-        )
+        is_available = self.coordinator.last_update_success and self._has_device_data
         
         # Log availability changes
         if self._last_availability is not None and self._last_availability != is_available:
@@ -249,14 +212,13 @@ class SenzomaticSensor(CoordinatorEntity, SensorEntity):
             else:
                 _LOGGER.warning(
                     "Sensor %s became UNAVAILABLE (device_id=%s..., type=%s, "
-                    "last_update_success=%s, data_present=%s, device_in_sensors=%s)",
+                    "last_update_success=%s, device_in_sensors=%s)",
                     self._attr_name,
                     self._device_id[:8],
                     self._sensor_type,
                     self.coordinator.last_update_success,
-                    self.coordinator.data is not None,
-                    self._device_id in self.coordinator.data.get("sensors", {}) if self.coordinator.data else False
+                    self._has_device_data
                 )
         
         self._last_availability = is_available
-        return is_available 
\ No newline at end of file
+        return is_available
@@ -3,17 +3,33 @@
 Standalone test script for Senzomatic API integration.
 This allows testing the API functionality without installing into Home Assistant.
 """
+import array
 import asyncio
-import json
 import logging
+import math
 import os
 import sys
-from getpass import getpass
 
 import aiohttp
+import orjson
+from aiolimiter import AsyncLimiter
 
 # Import our API module
-from custom_components.senzomatic.api import SenzomaticAPI
+from custom_components.senzomatic.api import MAX_CONCURRENT_REQUESTS, SenzomaticAPI
+
+# Conservative client-side pacing for the VM proxy
+MAX_REQUESTS_PER_SECOND = 5
+
+# Sensor types to test: (metric, display name)
+SENSOR_TYPES = (
+    ("temperature_ambient_celsius", "Temperature"),
+    ("rel_humidity_ambient_pct", "Relative Humidity"),
+    ("abs_humidity_ambient_gm3", "Absolute Humidity"),
+    ("moisture", "Wood Moisture"),
+)
+
+# Settings read once from the environment
+_ENV = {key: os.environ.get(key) for key in ("SENZOMATIC_HOST",)}
 
 # Set up logging to see what's happening
 logging.basicConfig(
@@ -21,216 +37,255 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-async def test_senzomatic_api():
+def _make_session():
+    """Create a session with bounded, keep-alive connections per host."""
+    connector = aiohttp.TCPConnector(
+        limit=64, limit_per_host=MAX_CONCURRENT_REQUESTS, keepalive_timeout=75
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+async def _with_session(*tests):
+    """Run each test coroutine function against one shared session."""
+    async with _make_session() as session:
+        for test in tests:
+            await test(session)
+
+async def _guarded(semaphore, limiter, coro):
+    """Await coro while holding a semaphore slot and a rate limiter token."""
+    async with semaphore, limiter:
+        return await coro
+
+async def _tagged(key, coro):
+    """Await coro and return (key, result), with any exception as the result."""
+    try:
+        return key, await coro
+    except Exception as e:
+        return key, e
+
+def _write_lines(lines):
+    """Write a block of status lines to stdout in one call."""
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+def _write_results(data):
+    """Write the full results to senzomatic_test_results.json."""
+    with open("senzomatic_test_results.json", "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+
+async def test_senzomatic_api(session):
     """Test the Senzomatic API functionality."""
     print("🔧 Senzomatic API Test Script")
     print("=" * 50)
     
-    # Get credentials from user
-    print("\n📝 Enter your Senzomatic credentials:")
-    username = os.getenv("USERNAME") 
-    password = os.getenv("PASSWORD")
-    oauth_client_id = os.getenv("OAUTH_CLIENT_ID")
-    if not username:
-        username = input("Email: ").strip()
-    else:
-        print(f"Email: {username} (from environment)")
-        
-    if not password:
-        password = getpass("Password: ").strip()
+    # Get the Central Unit address from the user
+    print("\n📝 Enter your Senzomatic Central Unit address:")
+    host = _ENV["SENZOMATIC_HOST"]
+    if not host:
+        host = input("IP address: ").strip()
     else:
-        print("Password: *** (from environment)")
+        print(f"IP address: {host} (from environment)")
     
-    if not username or not password:
-        print("❌ Username and password are required!")
+    if not host:
+        print("❌ IP address is required!")
         return
     
-    print(f"\n🔐 Testing authentication for: {username}")
+    print(f"\n🔐 Testing bootstrap from: {host}")
     
-    # Create aiohttp session
-    async with aiohttp.ClientSession() as session:
-        # Initialize API client
-        api = SenzomaticAPI(session, username, password, oauth_client_id)
-        
-        # Test 1: Authentication
-        print("\n1️⃣ Testing authentication...")
-        auth_success = await api.async_authenticate()
-        
-        if not auth_success:
-            print("❌ Authentication failed!")
-            print("   • Check your credentials")
-            print("   • Verify you can log in at https://erp.mgrd.cz")
-            return
-        
-        print("✅ Authentication successful!")
-        print(f"   • Installation ID: {api.installation_id}")
-        
-        # Test 2: Device Discovery
-        print("\n2️⃣ Discovering devices...")
-        devices = await api.async_get_device_list()
-        
-        if not devices:
-            print("❌ No devices found!")
-            print("   • Check that your account has access to sensors")
-            print("   • Verify devices are online")
-            return
-        
-        print(f"✅ Found {len(devices)} devices:")
-        for device in devices:
-            print(f"   • {device['name']} ({device['model']})")
-            if 'uuid' in device:
-                print(f"     UUID: {device['uuid']}")
-            else:
-                print("     ⚠️  No UUID found for this device")
-        
-        # Test 3: Sensor Data Retrieval
-        print("\n3️⃣ Testing sensor data retrieval...")
-        
-        # Test with first device that has UUID
-        test_device = None
-        for device in devices:
-            if 'uuid' in device:
-                test_device = device
-                break
-        
-        if not test_device:
-            print("❌ No devices with UUID found for testing!")
-            return
-        
-        print(f"📊 Testing with device: {test_device['name']}")
-        
-        # Test different sensor types
-        sensor_types = [
-            ("temperature_ambient_celsius", "Temperature"),
-            ("rel_humidity_ambient_pct", "Relative Humidity"), 
-            ("abs_humidity_ambient_gm3", "Absolute Humidity"),
-            ("moisture", "Wood Moisture")
-        ]
-        
-        sensor_results = {}
-        for sensor_type, sensor_name in sensor_types:
-            print(f"   • Testing {sensor_name}...")
-            try:
-                data = await api.async_get_sensor_data(test_device['uuid'], sensor_type)
-                
-                if data and data.get("data", {}).get("result"):
-                    result_data = data["data"]["result"]
-                    if result_data and len(result_data) > 0:
-                        values = result_data[0].get("values", [])
-                        if values:
-                            latest_value = values[-1][1] if len(values) > 0 else None
-                            if latest_value is not None:
-                                sensor_results[sensor_name] = float(latest_value)
-                                print(f"     ✅ {sensor_name}: {latest_value}")
-                            else:
-                                print(f"     ⚠️  {sensor_name}: No recent data")
-                        else:
-                            print(f"     ⚠️  {sensor_name}: No values in response")
-                    else:
-                        print(f"     ⚠️  {sensor_name}: Empty result")
-                else:
-                    print(f"     ⚠️  {sensor_name}: No data available")
-                    
-            except Exception as e:
-                print(f"     ❌ {sensor_name}: Error - {e}")
-        
-        # Test 4: Full Data Retrieval
-        print("\n4️⃣ Testing full data retrieval (like Home Assistant would use)...")
+    # Initialize API client
+    api = SenzomaticAPI(session, host)
+    
+    # Test 1: Authentication
+    print("\n1️⃣ Testing authentication...")
+    auth_success = await api.async_authenticate()
+    
+    if not auth_success:
+        print("❌ Authentication failed!")
+        print(f"   • Check that http://{host}/var/config.json is reachable")
+        print("   • Verify the Central Unit is activated and online")
+        return
+    
+    print("✅ Authentication successful!")
+    print(f"   • Central Unit ID: {api.unit_id}")
+    
+    # Test 2: Device Discovery
+    print("\n2️⃣ Discovering devices...")
+    devices = api.devices
+    
+    if not devices:
+        print("❌ No devices found!")
+        print("   • Check that devices are paired with the Central Unit")
+        print("   • Verify devices are online")
+        return
+    
+    lines = [f"✅ Found {len(devices)} devices:"]
+    for device in devices:
+        lines.append(f"   • {device['name']} ({device['model']})")
+        if 'uuid' in device:
+            lines.append(f"     UUID: {device['uuid']}")
+        else:
+            lines.append("     ⚠️  No UUID found for this device")
+    _write_lines(lines)
+    
+    # Test 3: Sensor Data Retrieval
+    print("\n3️⃣ Testing sensor data retrieval...")
+    
+    # Test every device that has a UUID
+    test_devices = [device for device in devices if 'uuid' in device]
+    
+    if not test_devices:
+        print("❌ No devices with UUID found for testing!")
+        return
+    
+    print(f"📊 Testing {len(test_devices)} devices")
+    
+    # Latest value per device, indexed like SENSOR_TYPES (nan = no data)
+    sensor_results = {
+        device['uuid']: array.array('d', [float('nan')] * len(SENSOR_TYPES))
+        for device in test_devices
+    }
+    print("   • Fetching all devices and sensor types concurrently...")
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    limiter = AsyncLimiter(MAX_REQUESTS_PER_SECOND, 1)
+    tasks = [
+        asyncio.create_task(
+            _tagged(
+                (device, index),
+                _guarded(semaphore, limiter, api.async_get_sensor_data(device['uuid'], sensor_type)),
+            )
+        )
+        for device in test_devices
+        for index, (sensor_type, _) in enumerate(SENSOR_TYPES)
+    ]
+    # Report each result as soon as it lands rather than after the whole grid
+    for next_done in asyncio.as_completed(tasks):
+        (device, index), data = await next_done
+        sensor_name = SENSOR_TYPES[index][1]
+        label = f"{device['name']} {sensor_name}"
+
+        if isinstance(data, Exception):
+            print(f"     ❌ {label}: Error - {data}")
+            continue
+
         try:
-            full_data = await api.async_get_data()
-            
-            if full_data and "devices" in full_data and "sensors" in full_data:
-                print("✅ Full data retrieval successful!")
-                
-                print(f"\n📋 Summary:")
-                print(f"   • Total devices: {len(full_data['devices'])}")
-                print(f"   • Devices with sensor data: {len(full_data['sensors'])}")
-                
-                print(f"\n📊 Sensor data by device:")
-                for device_id, sensors in full_data["sensors"].items():
-                    device_name = next(
-                        (d["name"] for d in full_data["devices"] if d["id"] == device_id),
-                        f"Device {device_id}"
+            result_data = data["data"]["result"]
+        except (KeyError, TypeError):
+            result_data = None
+
+        if not result_data:
+            print(f"     ⚠️  {label}: No data available")
+        elif not (values := result_data[0].get("values")):
+            print(f"     ⚠️  {label}: No values in response")
+        elif (latest_value := values[-1][1]) is None:
+            print(f"     ⚠️  {label}: No recent data")
+        else:
+            sensor_results[device['uuid']][index] = float(latest_value)
+            print(f"     ✅ {label}: {latest_value}")
+    
+    # Test 4: Full Data Retrieval
+    print("\n4️⃣ Testing full data retrieval (like Home Assistant would use)...")
+    try:
+        full_data = await api.async_get_data()
+        
+        if full_data and "devices" in full_data and "sensors" in full_data:
+            lines = [
+                "✅ Full data retrieval successful!",
+                "\n📋 Summary:",
+                f"   • Total devices: {len(full_data['devices'])}",
+                f"   • Devices with sensor data: {len(full_data['sensors'])}",
+                "\n📊 Sensor data by device:",
+            ]
+            name_by_id = {d["id"]: d["name"] for d in full_data["devices"]}
+            for device_id, sensors in full_data["sensors"].items():
+                device_name = name_by_id.get(device_id, f"Device {device_id}")
+                lines.append(f"   • {device_name}:")
+                for sensor_type, value in sensors.items():
+                    lines.append(f"     - {sensor_type}: {value}")
+
+            # Cross-check the bulk results against the per-device queries of Test 3
+            lines.append("\n🔍 Bulk vs. per-device values:")
+            mismatches = 0
+            for device_id, values in sensor_results.items():
+                bulk = full_data["sensors"].get(device_id, {})
+                for (sensor_type, sensor_name), value in zip(SENSOR_TYPES, values):
+                    if math.isnan(value) or bulk.get(sensor_type) == value:
+                        continue
+                    mismatches += 1
+                    lines.append(
+                        f"     ⚠️  {name_by_id.get(device_id, device_id)} {sensor_name}: "
+                        f"per-device {value}, bulk {bulk.get(sensor_type)}"
                     )
-                    print(f"   • {device_name}:")
-                    for sensor_type, value in sensors.items():
-                        print(f"     - {sensor_type}: {value}")
-                
-                # Save test results to file
-                with open("senzomatic_test_results.json", "w") as f:
-                    json.dump(full_data, f, indent=2)
-                print(f"\n💾 Full results saved to: senzomatic_test_results.json")
-                
-            else:
-                print("❌ Full data retrieval failed!")
-                
-        except Exception as e:
-            print(f"❌ Full data retrieval error: {e}")
+            if not mismatches:
+                lines.append("     ✅ All per-device values match the bulk data")
+            _write_lines(lines)
+            
+            # Save test results to file
+            await asyncio.to_thread(_write_results, full_data)
+            print(f"\n💾 Full results saved to: senzomatic_test_results.json")
+            
+        else:
+            print("❌ Full data retrieval failed!")
+            
+    except Exception as e:
+        print(f"❌ Full data retrieval error: {e}")
     
     print("\n🎉 Test completed!")
     print("\nIf all tests passed, the integration should work in Home Assistant.")
     print("If there were errors, check the logs above for troubleshooting.")
 
-async def test_specific_device():
+async def test_specific_device(session):
     """Test a specific device by UUID."""
     print("\n🎯 Test Specific Device")
     print("=" * 30)
     
-    username = input("Email: ").strip()
-    password = getpass("Password: ").strip()
+    host = _ENV["SENZOMATIC_HOST"] or input("IP address: ").strip()
     device_uuid = input("Device UUID: ").strip()
     
-    if not all([username, password, device_uuid]):
+    if not all([host, device_uuid]):
         print("❌ All fields are required!")
         return
     
-    async with aiohttp.ClientSession() as session:
-        api = SenzomaticAPI(session, username, password)
-        
-        if not await api.async_authenticate():
-            print("❌ Authentication failed!")
-            return
-        
-        print("✅ Authentication successful!")
-        
-        # Test all sensor types for this device
-        sensor_types = [
-            "temperature_ambient_celsius",
-            "rel_humidity_ambient_pct", 
-            "abs_humidity_ambient_gm3",
-            "moisture"
-        ]
-        
-        for sensor_type in sensor_types:
-            print(f"\n📊 Testing {sensor_type}:")
-            try:
-                data = await api.async_get_sensor_data(device_uuid, sensor_type)
-                print(f"Raw response: {json.dumps(data, indent=2)}")
-            except Exception as e:
-                print(f"Error: {e}")
+    api = SenzomaticAPI(session, host)
+    
+    if not await api.async_authenticate():
+        print("❌ Authentication failed!")
+        return
+    
+    print("✅ Authentication successful!")
+    
+    # Test all sensor types for this device
+    for sensor_type, _ in SENSOR_TYPES:
+        print(f"\n📊 Testing {sensor_type}:")
+        try:
+            data = await api.async_get_sensor_data(device_uuid, sensor_type)
+            print(f"Raw response: {orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()}")
+        except Exception as e:
+            print(f"Error: {e}")
 
 def main():
     """Main function with menu."""
     print("🏠 Senzomatic Home Assistant Integration Tester")
     print("=" * 55)
-    print()
-    print("Choose an option:")
-    print("1. Full API test (recommended)")
-    print("2. Test specific device by UUID")
-    print("3. Exit")
-    
-    choice = "1" #input("\nEnter choice (1-3): ").strip()
-    
-    if choice == "1":
-        asyncio.run(test_senzomatic_api())
-    elif choice == "2":
-        asyncio.run(test_specific_device())
-    elif choice == "3":
-        print("👋 Goodbye!")
-        sys.exit(0)
-    else:
-        print("❌ Invalid choice!")
-        main()
+    
+    while True:
+        print()
+        print("Choose an option:")
+        print("1. Full API test (recommended)")
+        print("2. Test specific device by UUID")
+        print("3. Exit")
+        
+        choice = "1" #input("\nEnter choice (1-3): ").strip()
+        
+        if choice == "1":
+            asyncio.run(_with_session(test_senzomatic_api))
+        elif choice == "2":
+            asyncio.run(_with_session(test_specific_device))
+        elif choice == "3":
+            print("👋 Goodbye!")
+            sys.exit(0)
+        else:
+            print("❌ Invalid choice!")
+            continue
+        break
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,127 @@
+"""Tests for the Senzomatic API client's metric probing."""
+from __future__ import annotations
+
+import asyncio
+import re
+from typing import Any
+
+import orjson
+
+from custom_components.senzomatic.api import METRIC_MISS_LIMIT, METRICS, SenzomaticAPI
+
+DEVICE_A = "aaaaaaaa-0000-0000-0000-000000000000"
+DEVICE_B = "bbbbbbbb-0000-0000-0000-000000000000"
+UUID_RE = re.compile(r"[0-9a-f]{8}-0000-0000-0000-000000000000")
+
+
+class FakeResponse:
+    """Minimal stand-in for an aiohttp response."""
+
+    def __init__(self, status: int, body: Any) -> None:
+        self.status = status
+        self._body = body
+        self.request_info = None
+        self.history = ()
+        self.headers: dict[str, str] = {}
+
+    async def __aenter__(self) -> FakeResponse:
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        return None
+
+    def raise_for_status(self) -> None:
+        return None
+
+    async def read(self) -> bytes:
+        return orjson.dumps(self._body)
+
+
+class FakeSession:
+    """Serves config.json and VM queries from in-memory device state."""
+
+    def __init__(self, reporting: dict[str, set[str]]) -> None:
+        # Metrics each device currently has samples for; empty set = offline.
+        self.reporting = reporting
+        self.failing: set[str] = set()
+        self.queried: list[tuple[str, set[str]]] = []
+
+    def get(self, url: str, params: dict[str, Any] | None = None, **kwargs: Any) -> FakeResponse:
+        if url.endswith("/var/config.json"):
+            return FakeResponse(200, {
+                "global": {"jwt_token": "token"},
+                "devices": {uuid: {"display_name": uuid[:4], "type": "HT03"} for uuid in self.reporting},
+            })
+        query = params["query"]
+        metric = next(m for m in METRICS if m in query)
+        device_ids = set(UUID_RE.findall(query))
+        self.queried.append((metric, device_ids))
+        if metric in self.failing:
+            return FakeResponse(500, {})
+        result = [
+            {"metric": {"device_id": device_id}, "values": [[0, "1.5"]]}
+            for device_id in sorted(device_ids)
+            if metric in self.reporting[device_id]
+        ]
+        return FakeResponse(200, {"data": {"result": result}})
+
+    def queried_for(self, device_id: str) -> set[str]:
+        return {metric for metric, ids in self.queried if device_id in ids}
+
+
+def _refresh(api: SenzomaticAPI, session: FakeSession) -> dict[str, Any]:
+    session.queried.clear()
+    return asyncio.run(api.async_get_data())
+
+
+def test_offline_device_is_queried_again_when_it_recovers() -> None:
+    """A device that is offline for a while must not be filtered out."""
+    session = FakeSession({DEVICE_A: set(METRICS), DEVICE_B: set()})
+    api = SenzomaticAPI(session, "192.0.2.1")
+
+    for _ in range(METRIC_MISS_LIMIT + 1):
+        _refresh(api, session)
+
+    session.reporting[DEVICE_B] = set(METRICS)
+    _refresh(api, session)
+    assert session.queried_for(DEVICE_B) == set(METRICS)
+    data = _refresh(api, session)
+    assert [device["id"] for device in data["devices"]] == [DEVICE_A, DEVICE_B]
+
+
+def test_reported_metric_is_never_skipped() -> None:
+    """A metric that went quiet after reporting keeps being queried."""
+    session = FakeSession({DEVICE_A: set(METRICS), DEVICE_B: set(METRICS)})
+    api = SenzomaticAPI(session, "192.0.2.1")
+    _refresh(api, session)
+
+    session.reporting[DEVICE_A] = set(METRICS) - {"moisture"}
+    for _ in range(METRIC_MISS_LIMIT + 1):
+        _refresh(api, session)
+    assert "moisture" in session.queried_for(DEVICE_A)
+
+
+def test_unsupported_metric_is_skipped_on_live_device() -> None:
+    """A live device that never reports a metric stops being queried for it."""
+    session = FakeSession({DEVICE_A: set(METRICS) - {"moisture"}, DEVICE_B: set(METRICS)})
+    api = SenzomaticAPI(session, "192.0.2.1")
+
+    for _ in range(METRIC_MISS_LIMIT):
+        _refresh(api, session)
+    _refresh(api, session)
+    assert session.queried_for(DEVICE_A) == set(METRICS) - {"moisture"}
+    assert session.queried_for(DEVICE_B) == set(METRICS)
+
+
+def test_failed_query_does_not_count_as_miss() -> None:
+    """A metric whose query fails is still requested on later refreshes."""
+    session = FakeSession({DEVICE_A: set(METRICS), DEVICE_B: set(METRICS)})
+    session.failing = {"moisture"}
+    api = SenzomaticAPI(session, "192.0.2.1")
+
+    for _ in range(METRIC_MISS_LIMIT + 1):
+        _refresh(api, session)
+    session.failing = set()
+    data = _refresh(api, session)
+    assert "moisture" in session.queried_for(DEVICE_A)
+    assert data["sensors"][DEVICE_A]["moisture"] == 1.5